@@ -6,23 +6,43 @@
 """
 
 import os
+import sys
+import math
+import asyncio
+import pickle
+import weakref
+import hashlib
 import logging
-from typing import Dict, Optional, Tuple
+import threading
+from collections import defaultdict
+from types import MappingProxyType
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Mapping, Optional, Set, Tuple, Union
 from dataclasses import dataclass
 
 # Rokid AR SDK 核心类
+import rokid
 from rokid.ar import ARScene, ModelLoader, Vector3, Quaternion
 from rokid.ar.model import Model3D
 from rokid.ar.anchor import Anchor
 from rokid.ar.common import ARResult
 
+# 实例化渲染（单份几何体 + 每实例变换数组），旧版SDK可能不提供
+try:
+    from rokid.ar.model import InstancedModel3D
+except ImportError:
+    InstancedModel3D = None
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Python 3.10+ 支持slots参数，去掉实例__dict__、加快属性访问
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class CreatureConfig:
-    """精灵配置数据类"""
+    """精灵配置数据类（不可变）"""
     creature_id: str
     model_path: str
     default_scale: float = 0.5
@@ -31,6 +51,42 @@ class CreatureConfig:
     shadow_enabled: bool = True
     collider_size: Tuple[float, float, float] = (1.0, 1.0, 1.0)
 
+class InstanceRef:
+    """
+    实例化模型中单个精灵的轻量句柄
+    
+    只提供逐实例的变换与锚点接口，写入所属实例组的实例数组
+    [位置, 旋转, 缩放, 锚点]；动画、阴影、碰撞体积由实例组统一设置。
+    卸载后句柄失效，再次调用会抛出RuntimeError
+    """
+    
+    def __init__(self, group_key: str, group, index: int):
+        self.group_key = group_key
+        self.group = group
+        self.index = index
+    
+    @property
+    def released(self) -> bool:
+        """句柄是否已随卸载失效"""
+        return self.group is None
+    
+    def _slot(self) -> list:
+        if self.group is None:
+            raise RuntimeError("实例已卸载，句柄失效")
+        return self.group.transforms[self.index]
+    
+    def set_position(self, position: Vector3):
+        self._slot()[0] = position
+    
+    def set_rotation(self, rotation: Quaternion):
+        self._slot()[1] = rotation
+    
+    def set_scale(self, scale: Vector3):
+        self._slot()[2] = scale
+    
+    def set_anchor(self, anchor: Anchor):
+        self._slot()[3] = anchor
+
 class Creature3DLoader:
     """
     3D精灵加载器
@@ -39,22 +95,75 @@ class Creature3DLoader:
     2. 初始化精灵在AR场景中的位置和姿态
     3. 配置动画、阴影、碰撞体积等属性
     4. 处理加载失败情况，提供备用方案
+    5. 进程级模型缓存，重复加载同一模型时直接克隆
+    6. 可选：SDK支持时，同类精灵共享一份几何体以实例化方式渲染
     """
     
-    def __init__(self, ar_scene: ARScene, base_asset_path: str = "assets/models"):
+    # 每个实例组的最大实例数，超出后退回克隆方式
+    INSTANCE_CAPACITY = 64
+    
+    # 后台预加载线程数
+    PRELOAD_WORKERS = 4
+    
+    # 异步加载使用的I/O线程数
+    IO_WORKERS = 2
+    
+    # 优先加载离线压缩（Draco/量化）的 .draco.glb 同名文件，不存在或SDK无法解码时使用原始 .glb
+    USE_COMPRESSED = True
+    COMPRESSED_SUFFIX = ".draco.glb"
+    
+    # 将解析后的模型序列化到磁盘，后续启动跳过glTF解析；按GLB修改时间、SDK版本和格式版本失效。
+    # 默认关闭：仅在确认SDK模型对象可完整序列化（不含原生句柄）时开启；
+    # 缓存通过pickle读取，缓存目录必须只有本应用可写
+    USE_DISK_CACHE = False
+    DISK_CACHE_DIRNAME = ".cache"
+    DISK_CACHE_FORMAT = 1
+    
+    # 地面锚点复用的空间网格边长（米），同一网格内的精灵共享锚点
+    ANCHOR_GRID_SIZE = 0.25
+    # 锚点缓存上限，超出后淘汰最久未使用的网格
+    MAX_CACHED_ANCHORS = 64
+    
+    # 模型缓存条目上限，超出后淘汰没有存活实例的模型
+    MAX_CACHED_MODELS = 8
+    
+    # 进程级GLB模型缓存：绝对路径 -> 加载中/已完成的模型Future
+    # 加载开始时即写入Future，并发请求同一模型时等待同一次解析
+    _MODEL_CACHE: Dict[str, Future] = {}
+    _MODEL_CACHE_LOCK = threading.Lock()
+    
+    # 与模型缓存同为进程级、受_MODEL_CACHE_LOCK保护的淘汰记录：
+    # 模型缓存键 -> 所有加载器中仍引用该模型的对象（克隆体、实例组、备用模型）的弱引用；
+    # 无法弱引用、无从判断是否存活的模型记入_PINNED_KEYS，不参与淘汰
+    _LIVE_INSTANCES: Dict[str, weakref.WeakSet] = defaultdict(weakref.WeakSet)
+    _PINNED_KEYS: Set[str] = set()
+    
+    def __init__(self, ar_scene: ARScene, base_asset_path: str = "assets/models",
+                 preload: bool = True, instancing: bool = False):
         """
         初始化3D精灵加载器
         
         Args:
             ar_scene: Rokid AR场景实例
             base_asset_path: 3D模型文件的基础路径
+            preload: 是否在后台预加载全部精灵模型
+            instancing: 是否以实例化方式生成同类精灵（需SDK提供InstancedModel3D）；
+                开启后使用默认动画的生成返回InstanceRef句柄，而非Model3D
         """
         self.ar_scene = ar_scene
         self.model_loader = ModelLoader()
+        # SDK未声明ModelLoader线程安全，后台线程各自持有独立的加载器
+        self._owner_thread = threading.get_ident()
+        self._thread_local = threading.local()
         self.base_asset_path = base_asset_path
+        # 预先拼好带分隔符的目录前缀，拼接路径时直接字符串相加
+        self._base_with_sep = (base_asset_path.rstrip('/\\') + os.sep
+                               if base_asset_path else "")
+        self._disk_cache_dir = os.path.join(base_asset_path, self.DISK_CACHE_DIRNAME)
+        self._disk_cache_enabled = self.USE_DISK_CACHE
         
         # 精灵配置映射
-        self.creature_configs: Dict[str, CreatureConfig] = {
+        self._configs: Dict[str, CreatureConfig] = {
             "dragon": CreatureConfig(
                 creature_id="dragon",
                 model_path="dragon.glb",
@@ -89,27 +198,415 @@ class Creature3DLoader:
             )
         }
         
+        # 对外只读；新增精灵通过register_creature，保证查找表同步更新
+        self.creature_configs: Mapping[str, CreatureConfig] = MappingProxyType(self._configs)
+        
+        # 预计算模型完整路径，并构建按索引访问的配置表
+        self._build_config_arrays()
+        
         # 加载失败的备用模型
         self.fallback_model = "fallback_cube.glb"
         
+        # 实例组：模型缓存键 -> 实例化模型（None表示添加场景失败，改用克隆），
+        # 以及各组可复用的空闲槽位
+        self.use_instancing = instancing and InstancedModel3D is not None
+        self._instance_groups: Dict[str, Optional[InstancedModel3D]] = {}
+        self._instance_free_slots: Dict[str, List[int]] = {}
+        
+        # SDK模型类型运行时不变，初始化时解析一次可选方法，避免每次生成调用hasattr
+        self._has_set_animation = hasattr(Model3D, 'set_animation')
+        self._has_enable_shadows = hasattr(Model3D, 'enable_shadows')
+        self._group_has_enable_shadows = (InstancedModel3D is not None
+                                          and hasattr(InstancedModel3D, 'enable_shadows'))
+        self._group_has_set_animation = (InstancedModel3D is not None
+                                         and hasattr(InstancedModel3D, 'set_animation'))
+        
+        # 模型文件验证结果缓存：文件路径 -> 是否有效
+        self._verify_cache: Dict[str, bool] = {}
+        
+        # 地面锚点缓存：空间网格坐标 -> 锚点（按最近使用排序）
+        self._anchor_cache: Dict[Tuple[int, int, int], Anchor] = {}
+        
+        # 后台预加载所有模型，与AR场景初始化并行，首次生成时只需克隆
+        self._preload_pool: Optional[ThreadPoolExecutor] = None
+        # 异步加载的I/O线程池，首次异步加载时创建，close()时关闭
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._io_pool_lock = threading.Lock()
+        if preload:
+            self._start_preload()
+        
+        # 备用模型在初始化时同步加载一次，失败路径上只需克隆
+        self._fallback_cached = self._load_fallback_base()
+        
+    def _build_config_arrays(self):
+        """
+        由creature_configs构建按索引访问的配置元组和模型完整路径
+        
+        完整路径与base_asset_path相关，由加载器自己保存，不写入共享的配置对象
+        """
+        configs = list(self._configs.values())
+        self._configs_tuple: Tuple[CreatureConfig, ...] = tuple(configs)
+        self._full_paths: Tuple[str, ...] = tuple(
+            self.get_model_full_path(c.model_path) for c in configs)
+        self._creature_ids: Tuple[str, ...] = tuple(c.creature_id for c in configs)
+        self._id_to_idx: Dict[str, int] = {cid: i for i, cid in enumerate(self._creature_ids)}
+    
+    def _resolve_index(self, creature_id: Union[str, int]) -> Optional[int]:
+        """将字符串ID或整数索引解析为配置表索引，无效时返回None"""
+        if isinstance(creature_id, int) and not isinstance(creature_id, bool):
+            if 0 <= creature_id < len(self._configs_tuple):
+                return creature_id
+            return None
+        return self._id_to_idx.get(creature_id)
+    
+    def _resolve_config(self, creature_id: Union[str, int]) -> Optional[CreatureConfig]:
+        """按字符串ID或整数索引获取精灵配置，整数索引直接取元组元素"""
+        idx = self._resolve_index(creature_id)
+        return None if idx is None else self._configs_tuple[idx]
+    
+    def register_creature(self, config: CreatureConfig):
+        """注册（或替换同ID的）精灵配置，并重建查找表"""
+        self._configs[config.creature_id] = config
+        self._build_config_arrays()
+    
+    def get_creature_index(self, creature_id: str) -> Optional[int]:
+        """获取精灵的整数索引，可代替字符串ID传入load_creature"""
+        return self._id_to_idx.get(creature_id)
+    
+    def _start_preload(self):
+        """提交全部精灵模型的预加载任务（备用模型由初始化同步加载）"""
+        self._preload_pool = ThreadPoolExecutor(max_workers=self.PRELOAD_WORKERS,
+                                                thread_name_prefix="creature-preload")
+        for model_path in self._full_paths:
+            self._preload_pool.submit(self._preload_one, model_path)
+        # 已提交的任务仍会执行完毕，完成后线程自动退出
+        self._preload_pool.shutdown(wait=False)
+    
+    def _preload_one(self, model_path: str):
+        """预加载单个模型到进程级缓存（model_path为已解析的完整路径）"""
+        if not self.verify_model_file(model_path):
+            return
+        try:
+            self._get_base_model(model_path)
+            logger.info("✅ 预加载完成: %s", model_path)
+        except Exception as e:
+            # 失败条目已从缓存移除，生成时会重新加载
+            logger.warning("预加载失败: %s: %s", model_path, e)
+    
     def get_model_full_path(self, model_path: str) -> str:
-        """获取模型文件的完整路径"""
-        return os.path.join(self.base_asset_path, model_path)
+        """获取模型文件的完整路径（启用压缩时优先返回存在的压缩版本）"""
+        full_path = self._base_with_sep + model_path
+        if (self.USE_COMPRESSED and full_path.endswith(".glb")
+                and not full_path.endswith(self.COMPRESSED_SUFFIX)):
+            compressed_path = full_path[:-len(".glb")] + self.COMPRESSED_SUFFIX
+            if os.path.exists(compressed_path):
+                return compressed_path
+        return full_path
     
     def verify_model_file(self, file_path: str) -> bool:
-        """验证模型文件是否存在且有效"""
+        """验证模型文件是否存在且有效（结果缓存，会话内模型文件不变）"""
+        cached = self._verify_cache.get(file_path)
+        if cached is not None:
+            return cached
+        
+        valid = self._check_model_file(file_path)
+        self._verify_cache[file_path] = valid
+        return valid
+    
+    def _check_model_file(self, file_path: str) -> bool:
+        """实际执行模型文件检查"""
         if not os.path.exists(file_path):
-            logger.error(f"模型文件不存在: {file_path}")
+            logger.error("模型文件不存在: %s", file_path)
             return False
             
         if not file_path.endswith('.glb'):
-            logger.error(f"不支持的文件格式: {file_path}")
+            logger.error("不支持的文件格式: %s", file_path)
             return False
             
         return True
     
+    def invalidate_verify_cache(self):
+        """清空文件验证缓存并重新解析模型路径（模型热更新、新增压缩文件后调用）"""
+        self._verify_cache.clear()
+        self._build_config_arrays()
+    
+    @staticmethod
+    def _cache_key(model_path: str) -> str:
+        """生成模型缓存键（去除查询参数并转为绝对路径）"""
+        return os.path.abspath(model_path.split('?', 1)[0])
+    
+    def _get_base_model(self, model_path: str) -> Model3D:
+        """
+        获取缓存中的共享模型，未缓存时加载
+        
+        同一模型正在加载时，后续调用等待已有的Future，不会重复解析
+        """
+        key = self._cache_key(model_path)
+        with Creature3DLoader._MODEL_CACHE_LOCK:
+            future = Creature3DLoader._MODEL_CACHE.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                Creature3DLoader._MODEL_CACHE[key] = future
+        
+        if is_owner:
+            # 在锁外解析，避免阻塞其他模型的加载
+            try:
+                model = self._load_glb_with_retry(model_path)
+            except BaseException as e:
+                # 移除失败条目，允许后续重试；等待者同样收到该异常，不会永久阻塞
+                with Creature3DLoader._MODEL_CACHE_LOCK:
+                    Creature3DLoader._MODEL_CACHE.pop(key, None)
+                future.set_exception(e)
+                raise
+            future.set_result(model)
+        
+        return future.result()
+    
+    def _load_glb_with_retry(self, model_path: str) -> Model3D:
+        """加载GLB模型；压缩版本加载失败（如SDK不支持Draco解码）时改用原始文件"""
+        try:
+            return self._load_glb_cached(model_path)
+        except Exception as e:
+            original_path = self._uncompressed_path(model_path)
+            if original_path is None or not self.verify_model_file(original_path):
+                raise
+            logger.warning("压缩模型加载失败，改用原始文件: %s: %s", model_path, e)
+            return self._load_glb_cached(original_path)
+    
+    def _uncompressed_path(self, model_path: str) -> Optional[str]:
+        """压缩模型对应的原始 .glb 路径，非压缩模型返回None"""
+        if not model_path.endswith(self.COMPRESSED_SUFFIX):
+            return None
+        return model_path[:-len(self.COMPRESSED_SUFFIX)] + ".glb"
+    
+    def _thread_model_loader(self) -> ModelLoader:
+        """获取当前线程的模型加载器：创建线程使用model_loader，其他线程各建一个"""
+        if threading.get_ident() == self._owner_thread:
+            return self.model_loader
+        loader = getattr(self._thread_local, "model_loader", None)
+        if loader is None:
+            loader = ModelLoader()
+            self._thread_local.model_loader = loader
+        return loader
+    
+    def _disk_cache_path(self, model_path: str) -> str:
+        """
+        计算磁盘缓存文件路径
+        
+        文件名为"GLB路径哈希-版本哈希.bin"，版本包含修改时间、SDK版本、缓存格式和Python版本，
+        任一变化后旧缓存自动失效，并可按路径前缀找到同一模型的旧缓存清理
+        """
+        mtime_ns = os.stat(model_path).st_mtime_ns
+        sdk_version = getattr(rokid, "__version__", "unknown")
+        source_key = hashlib.sha1(os.path.abspath(model_path).encode("utf-8"))
+        version = (f"{mtime_ns}:{sdk_version}:{self.DISK_CACHE_FORMAT}:"
+                   f"{sys.version_info[0]}.{sys.version_info[1]}")
+        version_key = hashlib.sha1(version.encode("utf-8"))
+        filename = f"{source_key.hexdigest()}-{version_key.hexdigest()}.bin"
+        return os.path.join(self._disk_cache_dir, filename)
+    
+    def _prune_disk_cache(self, cache_path: str):
+        """删除同一模型的旧版本缓存文件（模型或SDK更新后遗留）"""
+        current = os.path.basename(cache_path)
+        prefix = current.split("-", 1)[0] + "-"
+        try:
+            entries = os.listdir(self._disk_cache_dir)
+        except OSError:
+            return
+        for entry in entries:
+            # 只处理.bin，其他线程正在写入的临时文件不受影响
+            if entry.startswith(prefix) and entry.endswith(".bin") and entry != current:
+                self._remove_quietly(os.path.join(self._disk_cache_dir, entry))
+    
+    def _load_glb_cached(self, model_path: str) -> Model3D:
+        """
+        加载GLB模型，优先读取磁盘上的已解析缓存
+        
+        缓存只由本加载器写入；读取失败时重新解析，写入为尽力而为，失败不影响本次加载
+        """
+        if not self._disk_cache_enabled:
+            return self._thread_model_loader().load_glb(model_path)
+        
+        try:
+            cache_path = self._disk_cache_path(model_path)
+        except OSError as e:
+            logger.warning("磁盘缓存键计算失败: %s", e)
+            return self._thread_model_loader().load_glb(model_path)
+        
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                # 损坏或不兼容的缓存文件直接删除，下面重新解析后写入
+                logger.warning("磁盘缓存读取失败，重新解析: %s", e)
+                self._remove_quietly(cache_path)
+        
+        model = self._thread_model_loader().load_glb(model_path)
+        
+        # 先写临时文件再替换，避免并发预加载时读到写了一半的缓存
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self._disk_cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+            self._prune_disk_cache(cache_path)
+        except OSError as e:
+            logger.warning("磁盘缓存写入失败: %s", e)
+            self._remove_quietly(tmp_path)
+        except Exception as e:
+            # SDK模型对象不支持序列化，本次会话不再尝试
+            logger.warning("模型不支持磁盘缓存，已禁用: %s", e)
+            self._disk_cache_enabled = False
+            self._remove_quietly(tmp_path)
+        
+        return model
+    
+    @staticmethod
+    def _remove_quietly(path: str):
+        """删除文件，忽略不存在等错误"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    
+    def _load_model(self, model_path: str, base_model: Optional[Model3D] = None) -> Model3D:
+        """
+        加载GLB模型，返回缓存模型的克隆体，保证每个实例的变换互不影响
+        
+        base_model为调用方已取得的共享模型，传入时直接克隆，不再查询缓存
+        """
+        if base_model is None:
+            base_model = self._get_base_model(model_path)
+        model = base_model.clone()
+        self._track_live(self._cache_key(model_path), model)
+        self._maybe_evict_cache()
+        return model
+    
+    @classmethod
+    def _track_live(cls, key: str, obj):
+        """记录仍引用某缓存模型的对象，对象被回收后自动移出"""
+        with cls._MODEL_CACHE_LOCK:
+            try:
+                cls._LIVE_INSTANCES[key].add(obj)
+            except TypeError:
+                # SDK对象不支持弱引用，无法判断是否存活，固定保留
+                cls._PINNED_KEYS.add(key)
+    
+    @classmethod
+    def _maybe_evict_cache(cls):
+        """缓存超出上限时，按加载顺序淘汰所有加载器中都没有存活引用的模型"""
+        cache = cls._MODEL_CACHE
+        if len(cache) <= cls.MAX_CACHED_MODELS:
+            return
+        
+        with cls._MODEL_CACHE_LOCK:
+            for key in list(cache):
+                if len(cache) <= cls.MAX_CACHED_MODELS:
+                    break
+                # 加载中、常驻或仍有存活引用的模型均保留
+                live = cls._LIVE_INSTANCES.get(key)
+                if not cache[key].done() or key in cls._PINNED_KEYS or live:
+                    continue
+                del cache[key]
+                cls._LIVE_INSTANCES.pop(key, None)
+                logger.info("模型缓存已淘汰: %s", key)
+    
+    def _spawn_instance(self,
+                        model_path: str,
+                        config: CreatureConfig,
+                        spawn_position: Vector3,
+                        custom_scale: Optional[float],
+                        base_model: Optional[Model3D] = None) -> Optional[InstanceRef]:
+        """
+        在实例组中分配一个实例槽位
+        
+        首次生成某类精灵时创建实例组并添加到AR场景，按配置统一设置默认动画、
+        阴影和碰撞体积，之后只追加变换和地面锚点；
+        实例组已满或添加失败时返回None，由调用方退回克隆方式；
+        添加失败的模型不再重复创建实例组
+        """
+        key = self._cache_key(model_path)
+        if key in self._instance_groups:
+            group = self._instance_groups[key]
+            if group is None:
+                return None
+        else:
+            if base_model is None:
+                base_model = self._get_base_model(model_path)
+            group = InstancedModel3D(base=base_model, capacity=self.INSTANCE_CAPACITY)
+            try:
+                result = self.ar_scene.add_object(group)
+            except Exception as e:
+                result = e
+            if result != ARResult.SUCCESS:
+                logger.error("实例组添加场景失败: %s", result)
+                self._instance_groups[key] = None
+                return None
+            
+            # 已加入场景即登记，后续配置失败时实例组仍可复用，不会泄漏
+            self._instance_groups[key] = group
+            self._instance_free_slots[key] = []
+            self._track_live(key, group)
+            
+            if self._group_has_set_animation and config.default_animation:
+                try:
+                    group.set_animation(config.default_animation)
+                except Exception as e:
+                    logger.warning("实例组动画设置失败: %s", e)
+            try:
+                self._post_load_setup(group, config, self._group_has_enable_shadows)
+            except Exception as e:
+                logger.warning("实例组阴影设置失败: %s", e)
+        
+        try:
+            anchor = self._get_ground_anchor(spawn_position)
+        except Exception as e:
+            logger.warning("地面锚点绑定失败: %s", e)
+            anchor = None
+        transform = [spawn_position, Quaternion.identity(),
+                     self._scale_vector(config, custom_scale), anchor]
+        
+        free_slots = self._instance_free_slots[key]
+        if free_slots:
+            index = free_slots.pop()
+            group.transforms[index] = transform
+        elif len(group.transforms) < self.INSTANCE_CAPACITY:
+            index = len(group.transforms)
+            group.transforms.append(transform)
+        else:
+            logger.warning("实例组已满: %s", config.creature_id)
+            return None
+        
+        return InstanceRef(key, group, index)
+    
+    @classmethod
+    def clear_model_cache(cls):
+        """清空模型缓存（场景销毁时调用）"""
+        with cls._MODEL_CACHE_LOCK:
+            cls._MODEL_CACHE.clear()
+            cls._LIVE_INSTANCES.clear()
+            cls._PINNED_KEYS.clear()
+    
+    def _get_io_pool(self) -> ThreadPoolExecutor:
+        """获取异步加载的I/O线程池，不存在时创建（多个事件循环线程并发调用时只创建一个）"""
+        with self._io_pool_lock:
+            if self._io_pool is None:
+                self._io_pool = ThreadPoolExecutor(max_workers=self.IO_WORKERS,
+                                                   thread_name_prefix="creature-io")
+            return self._io_pool
+    
+    def close(self):
+        """关闭加载器持有的线程池（场景销毁时调用），进行中的加载会先完成"""
+        with self._io_pool_lock:
+            pool, self._io_pool = self._io_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+    
     def load_creature(self, 
-                     creature_id: str, 
+                     creature_id: Union[str, int], 
                      spawn_position: Vector3,
                      custom_scale: Optional[float] = None,
                      custom_animation: Optional[str] = None) -> Optional[Model3D]:
@@ -117,56 +614,207 @@ class Creature3DLoader:
         加载3D精灵到AR场景
         
         Args:
-            creature_id: 精灵类型ID
+            creature_id: 精灵类型ID，或get_creature_index返回的整数索引
             spawn_position: 初始位置（基于Rokid空间坐标）
             custom_scale: 自定义缩放比例（可选）
             custom_animation: 自定义动画名称（可选）
             
+        Returns:
+            Model3D: 加载完成的3D模型对象（开启实例化时可能为InstanceRef句柄），失败返回None
+        """
+        config, model = self._prepare_creature(creature_id, spawn_position,
+                                               custom_scale, custom_animation)
+        return self._add_prepared(creature_id, config, model)
+    
+    def _add_prepared(self,
+                      creature_id: Union[str, int],
+                      config: Optional[CreatureConfig],
+                      model: Optional[Model3D]) -> Optional[Model3D]:
+        """将_prepare_creature准备好的模型添加到AR场景并完成后续配置"""
+        if config is None:
+            return model
+        
+        # 7. 添加到AR场景
+        try:
+            result = self.ar_scene.add_object(model)
+            if result == ARResult.SUCCESS:
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("✅ 精灵已添加到AR场景: %s", creature_id)
+                self._post_load_setup(model, config)
+                return model
+            else:
+                logger.error("添加场景失败: %s", result)
+                return None
+                
+        except Exception as e:
+            logger.error("场景添加异常: %s", e)
+            return None
+    
+    async def load_creature_async(self,
+                                  creature_id: Union[str, int],
+                                  spawn_position: Vector3,
+                                  custom_scale: Optional[float] = None,
+                                  custom_animation: Optional[str] = None) -> Optional[Model3D]:
+        """
+        异步加载3D精灵到AR场景
+        
+        GLB读取与解析在I/O线程池中执行，AR帧循环可通过asyncio.create_task()
+        发起生成并继续渲染；模型就绪后在调用方线程完成配置和场景添加
+        
+        Args:
+            与load_creature相同
+            
         Returns:
             Model3D: 加载完成的3D模型对象，失败返回None
         """
-        logger.info(f"开始加载精灵: {creature_id}")
+        base_model = None
+        idx = self._resolve_index(creature_id)
+        if idx is not None and self.verify_model_file(self._full_paths[idx]):
+            loop = asyncio.get_running_loop()
+            try:
+                base_model = await loop.run_in_executor(self._get_io_pool(), self._get_base_model,
+                                                        self._full_paths[idx])
+            except Exception as e:
+                logger.error("❌ 加载3D模型失败: %s", e)
+                return self._load_fallback_model(spawn_position)
+        
+        # 直接使用取得的共享模型克隆和配置，期间缓存被淘汰也不会在事件循环线程上重新解析
+        config, model = self._prepare_creature(creature_id, spawn_position,
+                                               custom_scale, custom_animation, base_model)
+        return self._add_prepared(creature_id, config, model)
+    
+    def load_creatures_bulk(self,
+                            requests: List[Tuple[Union[str, int], Vector3]]
+                            ) -> List[Optional[Model3D]]:
+        """
+        批量加载3D精灵，所有克隆模型通过一次场景调用添加
+        
+        Args:
+            requests: (精灵类型ID或整数索引, 初始位置) 列表
+            
+        Returns:
+            与requests一一对应的模型列表，失败项为None
+        """
+        results: List[Optional[Model3D]] = [None] * len(requests)
+        pending: List[Tuple[int, Model3D, CreatureConfig]] = []
+        
+        for i, (creature_id, spawn_position) in enumerate(requests):
+            config, model = self._prepare_creature(creature_id, spawn_position)
+            if config is None:
+                results[i] = model
+            else:
+                pending.append((i, model, config))
+        
+        if not pending:
+            return results
+        
+        added = self._add_objects_batched([model for _, model, _ in pending])
+        for (i, model, config), ok in zip(pending, added):
+            if ok:
+                self._post_load_setup(model, config)
+                results[i] = model
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("✅ 批量添加精灵: %s/%s", sum(added), len(pending))
+        return results
+    
+    def _add_objects_batched(self, models: List[Model3D]) -> List[bool]:
+        """
+        批量添加模型到AR场景，返回每个模型是否添加成功
+        
+        优先使用SDK的add_objects批量接口，其次在batch()上下文中逐个添加；
+        添加过程抛出异常时，移除已添加的模型，全部按失败返回
+        """
+        added: List[bool] = []
+        try:
+            if hasattr(self.ar_scene, 'add_objects'):
+                # 批量接口异常时无法得知已添加哪些，按全部已添加回滚
+                added = [True] * len(models)
+                result = self.ar_scene.add_objects(models)
+                if result != ARResult.SUCCESS:
+                    logger.error("批量添加场景失败: %s", result)
+                    return [False] * len(models)
+                return added
+            
+            if hasattr(self.ar_scene, 'batch'):
+                with self.ar_scene.batch():
+                    for model in models:
+                        added.append(self.ar_scene.add_object(model) == ARResult.SUCCESS)
+            else:
+                for model in models:
+                    added.append(self.ar_scene.add_object(model) == ARResult.SUCCESS)
+            return added
+        except Exception as e:
+            logger.error("批量场景添加异常: %s", e)
+            for model, ok in zip(models, added):
+                if ok:
+                    try:
+                        self.ar_scene.remove_object(model)
+                    except Exception as remove_error:
+                        logger.warning("回滚场景添加失败: %s", remove_error)
+            return [False] * len(models)
+    
+    def _prepare_creature(self,
+                          creature_id: Union[str, int],
+                          spawn_position: Vector3,
+                          custom_scale: Optional[float] = None,
+                          custom_animation: Optional[str] = None,
+                          base_model: Optional[Model3D] = None
+                          ) -> Tuple[Optional[CreatureConfig], Optional[Model3D]]:
+        """
+        准备待添加到场景的精灵模型（base_model为已取得的共享模型，可选）
+        
+        Returns:
+            (config, model)：config不为None时model为已配置、待添加场景的克隆体；
+            config为None时model为最终结果（备用模型、实例句柄或None）
+        """
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("开始加载精灵: %s", creature_id)
         
         # 1. 获取精灵配置
-        config = self.creature_configs.get(creature_id)
-        if not config:
-            logger.error(f"未找到精灵配置: {creature_id}")
-            return self._load_fallback_model(spawn_position)
+        idx = self._resolve_index(creature_id)
+        if idx is None:
+            logger.error("未找到精灵配置: %s", creature_id)
+            return None, self._load_fallback_model(spawn_position)
+        config = self._configs_tuple[idx]
         
         # 2. 获取模型文件路径
-        model_path = self.get_model_full_path(config.model_path)
+        model_path = self._full_paths[idx]
         
         # 3. 验证文件
         if not self.verify_model_file(model_path):
-            return self._load_fallback_model(spawn_position)
+            return None, self._load_fallback_model(spawn_position)
+        
+        # 4. 优先以实例化方式生成（共享几何体，不增加绘制调用）；
+        #    实例共享实例组的动画，需要自定义动画时改用克隆
+        needs_own_animation = (custom_animation
+                               and custom_animation != config.default_animation)
+        if self.use_instancing and not needs_own_animation:
+            try:
+                instance = self._spawn_instance(model_path, config, spawn_position,
+                                                custom_scale, base_model)
+                if instance:
+                    if logger.isEnabledFor(logging.INFO):
+                        logger.info("✅ 精灵已实例化生成: %s", creature_id)
+                    return None, instance
+            except Exception as e:
+                logger.warning("实例化生成失败，改用克隆: %s", e)
         
-        # 4. 通过Rokid SDK加载3D模型
+        # 5. 通过Rokid SDK加载3D模型
         try:
-            model = self.model_loader.load_glb(model_path)
-            logger.info(f"✅ 成功加载3D模型: {model_path}")
+            model = self._load_model(model_path, base_model)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ 成功加载3D模型: %s", model_path)
             
         except Exception as e:
-            logger.error(f"❌ 加载3D模型失败: {e}")
-            return self._load_fallback_model(spawn_position)
+            logger.error("❌ 加载3D模型失败: %s", e)
+            return None, self._load_fallback_model(spawn_position)
         
-        # 5. 配置模型属性
+        # 6. 配置模型属性
         self._configure_model(model, config, spawn_position, 
                             custom_scale, custom_animation)
         
-        # 6. 添加到AR场景
-        try:
-            result = self.ar_scene.add_object(model)
-            if result == ARResult.SUCCESS:
-                logger.info(f"✅ 精灵已添加到AR场景: {creature_id}")
-                self._post_load_setup(model, config)
-                return model
-            else:
-                logger.error(f"添加场景失败: {result}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"场景添加异常: {e}")
-            return None
+        return config, model
     
     def _configure_model(self, 
                         model: Model3D, 
@@ -183,31 +831,64 @@ class Creature3DLoader:
         model.set_rotation(Quaternion.identity())
         
         # 设置缩放比例
-        scale = custom_scale if custom_scale else config.default_scale
-        model.set_scale(Vector3(scale, scale, scale))
+        model.set_scale(self._scale_vector(config, custom_scale))
         
         # 绑定到真实地面
         try:
-            anchor = Anchor.create_ground_anchor(spawn_position)
-            model.set_anchor(anchor)
+            model.set_anchor(self._get_ground_anchor(spawn_position))
             logger.info("✅ 已绑定到地面锚点")
         except Exception as e:
-            logger.warning(f"地面锚点绑定失败: {e}")
+            logger.warning("地面锚点绑定失败: %s", e)
         
         # 设置初始动画
         animation = custom_animation if custom_animation else config.default_animation
-        if hasattr(model, 'set_animation') and animation:
+        if self._has_set_animation and animation:
             try:
                 model.set_animation(animation)
-                logger.info(f"✅ 设置动画: {animation}")
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("✅ 设置动画: %s", animation)
             except Exception as e:
-                logger.warning(f"动画设置失败: {e}")
+                logger.warning("动画设置失败: %s", e)
     
-    def _post_load_setup(self, model: Model3D, config: CreatureConfig):
+    def _get_ground_anchor(self, position: Vector3) -> Anchor:
+        """
+        获取位置所在网格的地面锚点，网格内首次生成时才创建
+        
+        锚点建在网格中心（含高度方向），不依赖网格内首个精灵的位置
+        """
+        grid = self.ANCHOR_GRID_SIZE
+        key = (math.floor(position.x / grid),
+               math.floor(position.y / grid),
+               math.floor(position.z / grid))
+        anchor = self._anchor_cache.pop(key, None)
+        if anchor is None:
+            center = Vector3((key[0] + 0.5) * grid, (key[1] + 0.5) * grid, (key[2] + 0.5) * grid)
+            anchor = Anchor.create_ground_anchor(center)
+            if len(self._anchor_cache) >= self.MAX_CACHED_ANCHORS:
+                # dict按插入顺序排列，首项即最久未使用
+                del self._anchor_cache[next(iter(self._anchor_cache))]
+        self._anchor_cache[key] = anchor
+        return anchor
+    
+    def clear_anchor_cache(self):
+        """清空地面锚点缓存（平面检测重置或AR会话重启时调用）"""
+        self._anchor_cache.clear()
+    
+    @staticmethod
+    def _scale_vector(config: CreatureConfig, custom_scale: Optional[float]) -> Vector3:
+        """获取缩放向量；每次生成新建，SDK可能直接持有传入的向量，不能在精灵间共享"""
+        scale = custom_scale if custom_scale else config.default_scale
+        return Vector3(scale, scale, scale)
+    
+    def _post_load_setup(self, model: Model3D, config: CreatureConfig,
+                         has_enable_shadows: Optional[bool] = None):
         """加载完成后的额外配置"""
         
+        if has_enable_shadows is None:
+            has_enable_shadows = self._has_enable_shadows
+        
         # 启用阴影渲染
-        if config.shadow_enabled and hasattr(model, 'enable_shadows'):
+        if config.shadow_enabled and has_enable_shadows:
             model.enable_shadows()
             logger.info("✅ 已启用阴影渲染")
         
@@ -216,45 +897,84 @@ class Creature3DLoader:
             collider_x, collider_y, collider_z = config.collider_size
             model.set_collider("box", 
                              size=Vector3(collider_x, collider_y, collider_z))
-            logger.info(f"✅ 设置碰撞体积: {config.collider_size}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ 设置碰撞体积: %s", config.collider_size)
         except Exception as e:
-            logger.warning(f"碰撞体积设置失败: {e}")
+            logger.warning("碰撞体积设置失败: %s", e)
+    
+    def _load_fallback_base(self) -> Optional[Model3D]:
+        """加载并缓存备用模型，失败返回None"""
+        fallback_path = self.get_model_full_path(self.fallback_model)
+        if not self.verify_model_file(fallback_path):
+            logger.error("备用模型也不存在: %s", fallback_path)
+            return None
+        
+        try:
+            model = self._get_base_model(fallback_path)
+            # 加载器持有备用模型期间，该缓存条目不会被淘汰
+            self._track_live(self._cache_key(fallback_path), model)
+            return model
+        except Exception as e:
+            logger.error("备用模型加载失败: %s", e)
+            return None
     
     def _load_fallback_model(self, spawn_position: Vector3) -> Optional[Model3D]:
-        """加载备用模型"""
+        """加载备用模型（克隆初始化时缓存的模型）"""
         logger.warning("使用备用模型加载")
         
-        fallback_path = self.get_model_full_path(self.fallback_model)
-        if not os.path.exists(fallback_path):
-            logger.error(f"备用模型也不存在: {fallback_path}")
+        if self._fallback_cached is None:
             return None
         
         try:
-            model = self.model_loader.load_glb(fallback_path)
+            model = self._fallback_cached.clone()
             model.set_position(spawn_position)
             model.set_scale(Vector3(0.3, 0.3, 0.3))  # 缩小备用模型
             model.set_color(1.0, 0.0, 0.0)  # 红色提示
             self.ar_scene.add_object(model)
             return model
         except Exception as e:
-            logger.error(f"备用模型加载失败: {e}")
+            logger.error("备用模型加载失败: %s", e)
             return None
     
     def unload_creature(self, model: Model3D):
         """卸载3D精灵"""
+        if isinstance(model, InstanceRef):
+            if model.released:
+                logger.warning("精灵实例已卸载，忽略重复卸载")
+                return
+            # 实例化精灵只释放槽位，实例组保留在场景中供复用；句柄随之失效
+            model.group.transforms[model.index] = None
+            self._instance_free_slots[model.group_key].append(model.index)
+            model.group = None
+            logger.info("✅ 精灵实例槽位已释放")
+            return
+        
         try:
             self.ar_scene.remove_object(model)
             logger.info("✅ 精灵已从场景移除")
         except Exception as e:
-            logger.error(f"精灵卸载失败: {e}")
+            logger.error("精灵卸载失败: %s", e)
+        
+        # 调用方可能仍持有引用，主动移出存活集合后再检查缓存上限
+        with Creature3DLoader._MODEL_CACHE_LOCK:
+            try:
+                for live in Creature3DLoader._LIVE_INSTANCES.values():
+                    live.discard(model)
+            except TypeError:
+                pass
+        self._maybe_evict_cache()
     
-    def get_creature_config(self, creature_id: str) -> Optional[CreatureConfig]:
+    def get_creature_config(self, creature_id: Union[str, int]) -> Optional[CreatureConfig]:
         """获取精灵配置"""
-        return self.creature_configs.get(creature_id)
+        return self._resolve_config(creature_id)
     
     def list_available_creatures(self) -> list:
         """获取可用精灵列表"""
-        return list(self.creature_configs.keys())
+        return list(self._creature_ids)
+    
+    def list_rare_creatures(self) -> list:
+        """获取稀有精灵列表"""
+        return [c.creature_id for c in self._configs_tuple if c.is_rare]
 
 # 使用示例和测试代码
 if __name__ == "__main__":
@@ -7,6 +7,11 @@
 
 import sys
 import os
+import asyncio
+import pickle
+import tempfile
+import threading
+import time
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src/modules'))
 
 from creature_3d_loader import Creature3DLoader
@@ -30,6 +35,22 @@ class MockModel3D:
     def set_position(self, pos): self.position = pos
     def set_rotation(self, rot): self.rotation = rot
     def set_scale(self, scale): self.scale = scale
+    def set_color(self, r, g, b): self.color = (r, g, b)
+    def clone(self): return MockModel3D()
+
+class MockInstancedModel3D:
+    def __init__(self, base, capacity):
+        self.base = base
+        self.capacity = capacity
+        self.transforms = []
+        self.animation = None
+        self.collider = None
+    
+    def set_animation(self, name): self.animation = name
+    def set_collider(self, shape, size): self.collider = (shape, size)
+
+class MockARResult:
+    SUCCESS = True
 
 class MockARScene:
     def __init__(self):
@@ -58,6 +79,7 @@ creature_3d_loader.Quaternion = MockQuaternion
 creature_3d_loader.Model3D = MockModel3D
 creature_3d_loader.ARScene = MockARScene
 creature_3d_loader.ModelLoader = MockModelLoader
+creature_3d_loader.ARResult = MockARResult
 
 def test_creature_loader():
     """测试3D精灵加载器"""
@@ -65,17 +87,33 @@ def test_creature_loader():
     
     # 创建测试场景
     mock_scene = MockARScene()
-    loader = Creature3DLoader(mock_scene)
+    Creature3DLoader.clear_model_cache()
+    loader = Creature3DLoader(mock_scene, preload=False)
     
     # 测试1: 获取可用精灵
     creatures = loader.list_available_creatures()
     print(f"📋 可用精灵: {creatures}")
     assert len(creatures) > 0, "应该至少有一个可用精灵"
+    assert loader.list_rare_creatures() == ["dragon", "wolf"], "稀有精灵列表不正确"
+    dragon_idx = loader.get_creature_index("dragon")
+    assert loader.get_creature_config(dragon_idx).creature_id == "dragon", "整数索引应对应同一配置"
+    assert loader.get_creature_config(True) is None, "布尔值不应作为整数索引"
+    loader.register_creature(creature_3d_loader.CreatureConfig(creature_id="fox", model_path="cat.glb"))
+    assert "fox" in loader.list_available_creatures(), "注册后应出现在可用列表中"
+    fox_config = loader.get_creature_config("fox")
+    assert loader._full_paths[loader.get_creature_index("fox")].endswith("cat.glb"), "注册后应可加载"
+    
+    # 同一配置注册到不同资源目录的加载器，各自解析路径，互不覆盖
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        other = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+        other.register_creature(fox_config)
+        assert other._full_paths[other.get_creature_index("fox")].startswith(tmp_dir)
+        assert not loader._full_paths[loader.get_creature_index("fox")].startswith(tmp_dir), "不应覆盖其他加载器的路径"
     
     # 测试2: 加载存在的精灵
     spawn_pos = MockVector3(0, 0, -2)
-    creature = loader.load_creature("dragon", spawn_pos)
-    assert creature is not None, "应该成功加载龙精灵"
+    dragon = loader.load_creature("dragon", spawn_pos)
+    assert dragon is not None, "应该成功加载龙精灵"
     print("✅ 龙精灵加载成功")
     
     # 测试3: 加载不存在的精灵
@@ -83,13 +121,425 @@ def test_creature_loader():
     assert creature is not None, "应该加载备用模型"
     print("✅ 备用模型加载成功")
     
-    # 测试4: 卸载精灵
-    if creature:
-        loader.unload_creature(creature)
-        assert len(mock_scene.objects) == 0, "场景应该为空"
-        print("✅ 精灵卸载成功")
+    # 测试4: 重复加载命中模型缓存，返回独立克隆体
+    dragon_a = loader.load_creature("dragon", spawn_pos)
+    dragon_b = loader.load_creature("dragon", spawn_pos)
+    assert dragon_a is not dragon_b, "缓存命中时应返回独立的克隆体"
+    assert len(Creature3DLoader._MODEL_CACHE) == 2, "同一模型只应解析一次（龙 + 备用模型）"
+    assert dragon_a.scale is not dragon_b.scale, "缩放向量不应在精灵间共享"
+    for obj in (dragon_a, dragon_b):
+        loader.unload_creature(obj)
+    print("✅ 模型缓存命中成功")
+    
+    # 测试5: 批量加载精灵
+    batch = loader.load_creatures_bulk([("pikachu", spawn_pos), ("cat", spawn_pos)])
+    assert all(obj is not None for obj in batch), "批量加载应全部成功"
+    for obj in batch:
+        loader.unload_creature(obj)
+    print("✅ 批量加载成功")
+    
+    # 测试6: 异步加载精灵
+    wolf = asyncio.run(loader.load_creature_async("wolf", spawn_pos))
+    assert wolf is not None, "应该异步加载狼精灵"
+    loader.unload_creature(wolf)
+    loader.close()
+    assert loader._io_pool is None, "关闭后应释放I/O线程池"
+    print("✅ 异步加载成功")
+    
+    # 测试7: 卸载精灵
+    loader.unload_creature(dragon)
+    loader.unload_creature(creature)
+    assert len(mock_scene.objects) == 0, "场景应该为空"
+    print("✅ 精灵卸载成功")
     
     print("🎉 所有测试通过！")
 
+def test_instanced_creatures():
+    """测试实例化生成与卸载"""
+    original_instanced = creature_3d_loader.InstancedModel3D
+    creature_3d_loader.InstancedModel3D = MockInstancedModel3D
+    try:
+        mock_scene = MockARScene()
+        Creature3DLoader.clear_model_cache()
+        loader = Creature3DLoader(mock_scene, preload=False, instancing=True)
+        spawn_pos = MockVector3(0, 0, -2)
+        
+        # 同类精灵共享一个实例组，组上设置默认动画和碰撞体积
+        first = loader.load_creature("pikachu", spawn_pos)
+        second = loader.load_creature("pikachu", MockVector3(1, 0, -2))
+        assert isinstance(first, creature_3d_loader.InstanceRef), "应返回实例句柄"
+        assert first.group is second.group, "同类精灵应共享实例组"
+        assert first.group.animation == "idle", "实例组应设置默认动画"
+        assert first.group.collider is not None, "实例组应设置碰撞体积"
+        assert len(first.group.transforms[first.index]) == 4, "实例应记录地面锚点"
+        
+        # 自定义动画需要独立模型，改用克隆
+        running = loader.load_creature("pikachu", spawn_pos, custom_animation="run")
+        assert isinstance(running, MockModel3D), "自定义动画应使用克隆模型"
+        
+        # 重复卸载不会重复释放槽位，失效句柄不可再用
+        group = first.group
+        loader.unload_creature(first)
+        loader.unload_creature(first)
+        assert first.released, "卸载后句柄应失效"
+        try:
+            first.set_position(spawn_pos)
+            assert False, "失效句柄应拒绝写入"
+        except RuntimeError:
+            pass
+        third = loader.load_creature("pikachu", spawn_pos)
+        fourth = loader.load_creature("pikachu", spawn_pos)
+        assert third.index != fourth.index, "释放的槽位只应被复用一次"
+        assert len(group.transforms) == 3, "实例组应复用已释放的槽位"
+        
+        # 阴影设置失败时实例组仍被登记复用；添加场景失败后不再重复创建实例组
+        class ShadowlessGroup(MockInstancedModel3D):
+            def enable_shadows(self): raise RuntimeError("不支持阴影")
+        
+        class RejectingScene(MockARScene):
+            def add_object(self, obj):
+                if isinstance(obj, MockInstancedModel3D):
+                    self.rejected = getattr(self, "rejected", 0) + 1
+                    return False
+                return super().add_object(obj)
+        
+        creature_3d_loader.InstancedModel3D = ShadowlessGroup
+        mock_scene = MockARScene()
+        loader = Creature3DLoader(mock_scene, preload=False, instancing=True)
+        first = loader.load_creature("cat", spawn_pos)
+        second = loader.load_creature("cat", spawn_pos)
+        assert first.group is second.group, "阴影设置失败的实例组应被复用"
+        assert sum(isinstance(o, ShadowlessGroup) for o in mock_scene.objects) == 1, "不应泄漏实例组"
+        
+        rejecting_scene = RejectingScene()
+        loader = Creature3DLoader(rejecting_scene, preload=False, instancing=True)
+        for _ in range(2):
+            assert isinstance(loader.load_creature("cat", spawn_pos), MockModel3D), "应退回克隆方式"
+        assert rejecting_scene.rejected == 1, "添加失败后不应重复创建实例组"
+        print("✅ 实例化生成测试通过")
+    finally:
+        creature_3d_loader.InstancedModel3D = original_instanced
+
+def test_bulk_scene_add():
+    """测试批量添加走一次add_objects调用，逐个添加中途异常时回滚已添加的模型"""
+    class BatchScene(MockARScene):
+        def __init__(self):
+            super().__init__()
+            self.batch_calls = []
+        
+        def add_objects(self, objs):
+            self.batch_calls.append(list(objs))
+            self.objects.extend(objs)
+            return True
+    
+    class FlakyScene(MockARScene):
+        def add_object(self, obj):
+            if len(self.objects) == 2:
+                raise RuntimeError("场景已满")
+            return super().add_object(obj)
+    
+    requests = [("pikachu", MockVector3()), ("cat", MockVector3()), ("wolf", MockVector3())]
+    Creature3DLoader.clear_model_cache()
+    
+    batch_scene = BatchScene()
+    loader = Creature3DLoader(batch_scene, preload=False)
+    models = loader.load_creatures_bulk(requests)
+    assert len(batch_scene.batch_calls) == 1, "应只调用一次add_objects"
+    assert batch_scene.batch_calls[0] == models, "一次调用应包含全部模型"
+    
+    # 备用模型在初始化时未加入场景，场景中只有本次批量添加的模型
+    flaky_scene = FlakyScene()
+    loader = Creature3DLoader(flaky_scene, preload=False)
+    assert loader.load_creatures_bulk(requests) == [None] * 3, "异常时应全部按失败返回"
+    assert not flaky_scene.objects, "异常前已添加的模型应被移除"
+    Creature3DLoader.clear_model_cache()
+    print("✅ 批量场景添加测试通过")
+
+def _make_asset_dir(tmp_dir, extra=()):
+    """在临时目录中创建空的模型文件"""
+    names = ["dragon.glb", "pikachu.glb", "cat.glb", "wolf.glb", "fallback_cube.glb"]
+    for name in names + list(extra):
+        open(os.path.join(tmp_dir, name), "wb").close()
+
+def test_compressed_model_retry():
+    """测试压缩模型无法解码时改用原始文件"""
+    class NoDracoLoader(MockModelLoader):
+        def load_glb(self, path):
+            if path.endswith(".draco.glb"):
+                raise ValueError("不支持Draco解码")
+            return super().load_glb(path)
+    
+    creature_3d_loader.ModelLoader = NoDracoLoader
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _make_asset_dir(tmp_dir, extra=["dragon.draco.glb"])
+            Creature3DLoader.clear_model_cache()
+            loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+            assert loader._full_paths[loader.get_creature_index("dragon")].endswith(".draco.glb")
+            dragon = loader.load_creature("dragon", MockVector3(0, 0, -2))
+            assert dragon is not None and not hasattr(dragon, "color"), "应加载原始模型而非备用模型"
+            print("✅ 压缩模型回退测试通过")
+    finally:
+        creature_3d_loader.ModelLoader = MockModelLoader
+        Creature3DLoader.clear_model_cache()
+
+def test_verify_cache():
+    """测试重复生成不再检查文件系统，失效后重新解析压缩文件"""
+    original_exists = os.path.exists
+    checks = []
+    
+    def counting_exists(path):
+        checks.append(path)
+        return original_exists(path)
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        _make_asset_dir(tmp_dir)
+        Creature3DLoader.clear_model_cache()
+        loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+        loader.load_creature("cat", MockVector3())
+        os.path.exists = counting_exists
+        try:
+            for _ in range(3):
+                assert loader.load_creature("cat", MockVector3()) is not None
+            assert not checks, "验证结果缓存命中时不应检查文件系统"
+            
+            # 新增压缩文件后失效缓存，应改用压缩版本并重新验证
+            open(os.path.join(tmp_dir, "cat.draco.glb"), "wb").close()
+            loader.invalidate_verify_cache()
+            cat_path = loader._full_paths[loader.get_creature_index("cat")]
+            assert cat_path.endswith(".draco.glb"), "失效后应重新选择压缩文件"
+            assert loader.load_creature("cat", MockVector3()) is not None
+            assert loader._verify_cache.get(cat_path) is True, "失效后应重新验证压缩文件"
+            del checks[:]
+            for _ in range(2):
+                assert loader.load_creature("cat", MockVector3()) is not None
+            assert not checks, "重新验证后不应再检查文件系统"
+        finally:
+            os.path.exists = original_exists
+            Creature3DLoader.clear_model_cache()
+    print("✅ 文件验证缓存测试通过")
+
+class CountingLoader(MockModelLoader):
+    """记录load_glb调用次数的模拟加载器"""
+    calls = 0
+    
+    def load_glb(self, path):
+        CountingLoader.calls += 1
+        return super().load_glb(path)
+
+class UnpicklableModel3D(MockModel3D):
+    def __reduce__(self):
+        raise ValueError("原生句柄不可序列化")
+
+def test_concurrent_load_dedup():
+    """测试多线程同时加载同一模型时只解析一次"""
+    class SlowLoader(CountingLoader):
+        def load_glb(self, path):
+            time.sleep(0.05)
+            return super().load_glb(path)
+    
+    creature_3d_loader.ModelLoader = SlowLoader
+    try:
+        Creature3DLoader.clear_model_cache()
+        loader = Creature3DLoader(MockARScene(), preload=False)
+        path = loader.get_model_full_path("dragon.glb")
+        CountingLoader.calls = 0
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(loader._get_base_model(path)))
+                   for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert CountingLoader.calls == 1, "并发加载同一模型只应解析一次"
+        assert len(results) == 4 and all(r is results[0] for r in results), "所有线程应得到同一模型"
+        print("✅ 并发加载去重测试通过")
+    finally:
+        creature_3d_loader.ModelLoader = MockModelLoader
+        Creature3DLoader.clear_model_cache()
+
+def test_background_preload():
+    """测试后台预加载每个模型只解析一次，之后生成无需再解析"""
+    creature_3d_loader.ModelLoader = CountingLoader
+    try:
+        Creature3DLoader.clear_model_cache()
+        CountingLoader.calls = 0
+        loader = Creature3DLoader(MockARScene(), preload=True)
+        loader._preload_pool.shutdown(wait=True)
+        parsed = CountingLoader.calls
+        assert parsed == len(loader.list_available_creatures()) + 1, "每个模型（含备用模型）应只解析一次"
+        assert loader.load_creature("cat", MockVector3()) is not None
+        assert CountingLoader.calls == parsed, "预加载后生成不应再解析"
+        print("✅ 后台预加载测试通过")
+    finally:
+        creature_3d_loader.ModelLoader = MockModelLoader
+        Creature3DLoader.clear_model_cache()
+
+def test_async_uses_loaded_model():
+    """测试异步加载直接使用I/O线程取得的模型，缓存随后被淘汰也不在调用方线程重新解析"""
+    class ThreadRecordingLoader(MockModelLoader):
+        threads = []
+        
+        def load_glb(self, path):
+            ThreadRecordingLoader.threads.append(threading.current_thread().name)
+            return super().load_glb(path)
+    
+    creature_3d_loader.ModelLoader = ThreadRecordingLoader
+    try:
+        Creature3DLoader.clear_model_cache()
+        loader = Creature3DLoader(MockARScene(), preload=False)
+        ThreadRecordingLoader.threads = []
+        original_get = loader._get_base_model
+        
+        def get_then_evict(model_path):
+            # 模拟等待期间其他线程淘汰了缓存
+            model = original_get(model_path)
+            Creature3DLoader.clear_model_cache()
+            return model
+        
+        loader._get_base_model = get_then_evict
+        wolf = asyncio.run(loader.load_creature_async("wolf", MockVector3()))
+        loader.close()
+        assert wolf is not None, "应该异步加载狼精灵"
+        assert len(ThreadRecordingLoader.threads) == 1, "只应解析一次"
+        assert ThreadRecordingLoader.threads[0].startswith("creature-io"), "解析应在I/O线程中进行"
+        print("✅ 异步加载模型复用测试通过")
+    finally:
+        creature_3d_loader.ModelLoader = MockModelLoader
+        Creature3DLoader.clear_model_cache()
+
+def test_disk_cache():
+    """测试磁盘解析缓存的读写与写入失败处理"""
+    creature_3d_loader.ModelLoader = CountingLoader
+    Creature3DLoader.USE_DISK_CACHE = True
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _make_asset_dir(tmp_dir)
+            cache_dir = os.path.join(tmp_dir, Creature3DLoader.DISK_CACHE_DIRNAME)
+            
+            # 首次启动解析并写入缓存，再次启动直接读取缓存
+            Creature3DLoader.clear_model_cache()
+            loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+            assert loader.load_creature("cat", MockVector3()) is not None
+            assert len(os.listdir(cache_dir)) == 2, "应写入猫和备用模型的缓存"
+            
+            Creature3DLoader.clear_model_cache()
+            CountingLoader.calls = 0
+            loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+            assert loader.load_creature("cat", MockVector3()) is not None
+            assert CountingLoader.calls == 0, "缓存命中时不应重新解析"
+            
+            # 模型文件更新后重新解析，同一模型的旧缓存被清理
+            cat_path = os.path.join(tmp_dir, "cat.glb")
+            stat = os.stat(cat_path)
+            os.utime(cat_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            Creature3DLoader.clear_model_cache()
+            loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+            assert loader.load_creature("cat", MockVector3()) is not None
+            assert CountingLoader.calls == 1, "模型更新后应重新解析"
+            assert len(os.listdir(cache_dir)) == 2, "旧版本缓存应被清理"
+            
+            # 损坏的缓存文件被删除并重新写入
+            cat_cache = loader._disk_cache_path(cat_path)
+            with open(cat_cache, "wb") as f:
+                f.write(b"not a pickle")
+            Creature3DLoader.clear_model_cache()
+            loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+            assert loader.load_creature("cat", MockVector3()) is not None
+            assert CountingLoader.calls == 2, "缓存损坏时应重新解析"
+            with open(cat_cache, "rb") as f:
+                assert isinstance(pickle.load(f), MockModel3D), "应重新写入有效缓存"
+        
+        # 序列化抛出任意异常时，加载仍成功且不遗留临时文件
+        original_clone = MockModel3D.clone
+        MockModel3D.clone = lambda self: UnpicklableModel3D()
+        creature_3d_loader.ModelLoader = type(
+            "UnpicklableLoader", (MockModelLoader,),
+            {"load_glb": lambda self, path: UnpicklableModel3D()})
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                _make_asset_dir(tmp_dir)
+                cache_dir = os.path.join(tmp_dir, Creature3DLoader.DISK_CACHE_DIRNAME)
+                Creature3DLoader.clear_model_cache()
+                loader = Creature3DLoader(MockARScene(), base_asset_path=tmp_dir, preload=False)
+                assert loader._fallback_cached is not None, "备用模型应加载成功"
+                assert loader.load_creature("wolf", MockVector3()) is not None
+                leftovers = os.listdir(cache_dir) if os.path.isdir(cache_dir) else []
+                assert not leftovers, "不应遗留缓存或临时文件"
+        finally:
+            MockModel3D.clone = original_clone
+        print("✅ 磁盘缓存测试通过")
+    finally:
+        creature_3d_loader.ModelLoader = MockModelLoader
+        Creature3DLoader.USE_DISK_CACHE = False
+        Creature3DLoader.clear_model_cache()
+
+def test_anchor_cache():
+    """测试地面锚点缓存的复用、上限与清理"""
+    class MockAnchor:
+        created = 0
+        
+        def __init__(self, position):
+            self.position = position
+        
+        @staticmethod
+        def create_ground_anchor(position):
+            MockAnchor.created += 1
+            return MockAnchor(position)
+    
+    original_anchor = creature_3d_loader.Anchor
+    creature_3d_loader.Anchor = MockAnchor
+    try:
+        loader = Creature3DLoader(MockARScene(), preload=False)
+        loader.MAX_CACHED_ANCHORS = 2
+        first = loader._get_ground_anchor(MockVector3(0.01, 0, -2))
+        assert loader._get_ground_anchor(MockVector3(0.2, 0.1, -2)) is first, "同一网格应复用锚点"
+        grid = loader.ANCHOR_GRID_SIZE
+        assert (first.position.x, first.position.y) == (grid / 2, grid / 2), "锚点应位于网格中心"
+        loader._get_ground_anchor(MockVector3(1, 0, -2))
+        loader._get_ground_anchor(MockVector3(2, 0, -2))
+        assert len(loader._anchor_cache) == 2, "锚点缓存不应超过上限"
+        loader.clear_anchor_cache()
+        assert not loader._anchor_cache, "清理后锚点缓存应为空"
+        print("✅ 锚点缓存测试通过")
+    finally:
+        creature_3d_loader.Anchor = original_anchor
+
+def test_cache_eviction():
+    """测试缓存淘汰只移除所有加载器都不再引用的模型"""
+    Creature3DLoader.clear_model_cache()
+    original_max = Creature3DLoader.MAX_CACHED_MODELS
+    Creature3DLoader.MAX_CACHED_MODELS = 2
+    try:
+        loader_a = Creature3DLoader(MockARScene(), preload=False)
+        loader_b = Creature3DLoader(MockARScene(), preload=False)
+        dragon = loader_a.load_creature("dragon", MockVector3())
+        
+        for creature_id in ("cat", "wolf"):
+            obj = loader_b.load_creature(creature_id, MockVector3())
+            loader_b.unload_creature(obj)
+            del obj
+        loader_b.load_creature("pikachu", MockVector3())
+        
+        cached = {os.path.basename(key) for key in Creature3DLoader._MODEL_CACHE}
+        assert "dragon.glb" in cached, "其他加载器仍持有克隆体的模型不应被淘汰"
+        assert "fallback_cube.glb" in cached, "备用模型不应被淘汰"
+        assert "cat.glb" not in cached, "无存活实例的模型应被淘汰"
+        assert dragon is not None
+        print("✅ 缓存淘汰测试通过")
+    finally:
+        Creature3DLoader.MAX_CACHED_MODELS = original_max
+        Creature3DLoader.clear_model_cache()
+
 if __name__ == "__main__":
-    test_creature_loader()
\ No newline at end of file
+    test_creature_loader()
+    test_instanced_creatures()
+    test_bulk_scene_add()
+    test_compressed_model_retry()
+    test_verify_cache()
+    test_concurrent_load_dedup()
+    test_background_preload()
+    test_async_uses_loaded_model()
+    test_disk_cache()
+    test_anchor_cache()
+    test_cache_eviction()
\ No newline at end of file